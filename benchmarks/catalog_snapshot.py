@@ -0,0 +1,109 @@
+# Compare the repository's catalog snapshot path against its SQL path
+#
+# Usage: python benchmarks/catalog_snapshot.py [number_of_services]
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Always benchmark against a throwaway in-memory database
+os.environ["DATABASE_URL"] = "sqlite://"
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.db_setup import SessionLocal, init_db
+from database.models import Service
+from services.catalog_snapshot import build_snapshot
+from services.service_handler import SQLAlchemyServiceRepository
+
+CITIES = ["Kampala", "Gulu", "Jinja", "Mbarara", "Entebbe", "Mbale", "Nairobi", "Kigali"]
+COUNTRIES = {"Nairobi": "Kenya", "Kigali": "Rwanda"}
+MAX_PRICE = 50000
+LIMIT = 20
+ROUNDS = 5
+
+
+def seed(db, count: int):
+    rng = random.Random(42)
+    rows = []
+    for service_id in range(1, count + 1):
+        city = rng.choice(CITIES)
+        rows.append({
+            "service_id": service_id,
+            "service_name": f"service-{service_id}",
+            "description": "benchmark service",
+            "price": round(rng.uniform(5000, 200000), 2),
+            "image_path": "",
+            "city": city,
+            "country": COUNTRIES.get(city, "Uganda"),
+            "is_active": 1,
+            "is_available_in_location": rng.random() < 0.8,
+            "latitude": rng.uniform(-1.5, 3.5),
+            "longitude": rng.uniform(29.5, 35.0),
+        })
+        if len(rows) == 50000:
+            db.bulk_insert_mappings(Service, rows)
+            rows.clear()
+    if rows:
+        db.bulk_insert_mappings(Service, rows)
+    db.commit()
+
+
+def timed(fn, rounds: int = ROUNDS):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure_memory(fn):
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main(count: int):
+    init_db()
+    db = SessionLocal()
+    print(f"Seeding {count} services...")
+    seed(db, count)
+
+    orm_bytes, orm_rows = measure_memory(lambda: db.query(Service).all())
+    print(f"ORM objects:       {orm_bytes / count:8.1f} bytes/service")
+    del orm_rows
+    db.close()
+
+    with SessionLocal() as session:
+        snapshot_bytes, snapshot = measure_memory(lambda: build_snapshot(session))
+    print(f"Catalog snapshot:  {snapshot_bytes / count:8.1f} bytes/service "
+          f"(columns {snapshot.memory_bytes() / count:.1f})")
+
+    # Same API and result objects on both sides; only the lookup path differs
+    paths = {
+        "SQL": SQLAlchemyServiceRepository(session_factory=SessionLocal),
+        "Snapshot": SQLAlchemyServiceRepository(session_factory=SessionLocal, catalog=snapshot),
+    }
+    results = {}
+    for name, repository in paths.items():
+        elapsed, results[name] = timed(
+            lambda: repository.get_by_location("Kampala", "Uganda", max_price=MAX_PRICE, limit=LIMIT)
+        )
+        print(f"{name + ' cheapest:':<19}{elapsed * 1000:8.2f} ms")
+    assert [s.service_id for s in results["SQL"]] == [s.service_id for s in results["Snapshot"]]
+
+    for name, repository in paths.items():
+        elapsed, results[name] = timed(
+            lambda: repository.get_by_location("", "", near=(0.3476, 32.5825), limit=LIMIT),
+            rounds=1 if name == "SQL" else ROUNDS
+        )
+        print(f"{name + ' nearest:':<19}{elapsed * 1000:8.2f} ms")
+    assert [s.service_id for s in results["SQL"]] == [s.service_id for s in results["Snapshot"]]
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -10,25 +10,26 @@ from telegram.ext import (
     )
 import os
 import sys
-from database.models import Order, Service
+import asyncio
+import functools
+from datetime import date, datetime
 from database.db_setup import init_db, SessionLocal
+from database.migrate_services import services_table_is_current
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import List, Optional
-from fastapi import FastAPI, Request, APIRouter, HTTPException
+from fastapi import FastAPI, Request, APIRouter, HTTPException, Query
 from contextlib import asynccontextmanager, contextmanager
 import logging
-from services.service_handler import ServiceManager, SQLiteServiceRepository, PILImageGenerator
+from services.service_handler import (
+    ServiceManager, SQLAlchemyServiceRepository, PILImageGenerator, Service, ServiceLocation
+    )
+from services.catalog_snapshot import build_snapshot, track_changes
+from services.order_handler import create_order, roll_up_events, compact_event_log, get_order_stats
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-# Initialize service manager with SQLite repository and image generator
-repository = SQLiteServiceRepository()
-image_generator = PILImageGenerator()
-service_manager = ServiceManager(repository=repository, image_generator=image_generator)
-
-
 # Enable logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -49,6 +50,8 @@ load_dotenv()
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 BOT_USERNAME = os.getenv("BOT_USERNAME")
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "300"))
+CATALOG_RESYNC_SECONDS = int(os.getenv("CATALOG_RESYNC_SECONDS", "300"))
 
 
 # Initiate FastAPI and telegram bot
@@ -59,18 +62,52 @@ bot_app = ApplicationBuilder()\
     .concurrent_updates(True)\
     .build()
   
-# initialise database
+# initialise database; schema upgrades and legacy data go through the one-shot migration
+if not services_table_is_current():
+    raise RuntimeError("services table is outdated, run `python -m database.migrate_services` first")
 init_db()
-db = SessionLocal()
+
+# Columnar catalog used for filtering/sorting, kept in sync on every commit made by
+# this process and resynced every CATALOG_RESYNC_SECONDS for writes made elsewhere
+with SessionLocal() as db:
+    catalog = track_changes(build_snapshot(db), SessionLocal)
+
+# Initialize service manager with the shared repository and image generator
+repository = SQLAlchemyServiceRepository(session_factory=SessionLocal, catalog=catalog)
+image_generator = PILImageGenerator()
+service_manager = ServiceManager(repository=repository, image_generator=image_generator)
 
 class ServiceCreate(BaseModel):
     service_name: str
     description: str
     price: float
-    image_path: str
-    location: str
+    image_path: Optional[str] = None
+    city: str
+    country: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    provider_id: Optional[int] = None
     service_id: Optional[int] = None
 
+def to_service_create(service: Service) -> ServiceCreate:
+    return ServiceCreate(
+        service_name=service.service_name,
+        description=service.description,
+        price=service.price,
+        image_path=service.image_path,
+        city=service.location.city,
+        country=service.location.country,
+        latitude=service.location.latitude,
+        longitude=service.location.longitude,
+        provider_id=service.provider_id,
+        service_id=service.service_id
+    )
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call in the default executor, off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
 # Bot command handlers
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start coverstion with user"""
@@ -135,11 +172,25 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             context.user_data['manual_location'] = update.message.text
             location_type = "manual"
 
-        with get_db() as db:
-            services = service_manager.get_services_by_location(
-                db=db,
-                city=context.user_data.get('manual_location', ''),
-                country=''
+        if location_type == "coordinates":
+            services = await run_blocking(
+                service_manager.get_services_by_location,
+                city='',
+                country='',
+                near=(context.user_data['latitude'], context.user_data['longitude']),
+                limit=10
+            )
+            if not services:
+                # No nearby provider has shared coordinates; offer the cheapest services
+                services = await run_blocking(
+                    service_manager.get_services_by_location, city='', country='', limit=10
+                )
+        else:
+            services = await run_blocking(
+                service_manager.get_services_by_location,
+                city=context.user_data['manual_location'],
+                country='',
+                limit=10
             )
         
         if not services:
@@ -171,7 +222,7 @@ async def handle_service_selection(update: Update, context: ContextTypes.DEFAULT
         selected_service = update.message.text
         context.user_data['selected_service'] = selected_service
 
-        service = db.query(Service).filter(Service.service_name == selected_service).first()
+        service = service_manager.get_service_by_name(selected_service)
         if not service:
             await update.message.reply_text(
                 "Service not found. Please try again",
@@ -182,8 +233,6 @@ async def handle_service_selection(update: Update, context: ContextTypes.DEFAULT
         comfirm_keyboard = [['Confirm ✅', 'Cancel ❌']]
         reply_markup=ReplyKeyboardMarkup(comfirm_keyboard, resize=True)
 
-        service = db.query(Service).filter(Service.service_name == selected_service).first()
-
         await update.message.reply_text(
             f"You ordered for : {selected_service}\n"
             f"You'll be charged Ugx {service.price} for the service.\n"
@@ -204,21 +253,17 @@ async def handle_service_selection(update: Update, context: ContextTypes.DEFAULT
 async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         if update.message.text == 'Confirm ✅':
-            with get_db() as db:
-                service = db.query(Service).filter(
-                    Service.service_name == context.user_data.get('selected_service')
-                ).first()
-                
-                if not service:
-                    raise ValueError("Service not found")
+            service = service_manager.get_service_by_name(context.user_data.get('selected_service'))
+            if not service:
+                raise ValueError("Service not found")
 
-                new_order = Order(
+            with get_db() as db:
+                create_order(
+                    db,
                     service_id=service.service_id,
-                    user_id=service.user_id,
-                    status="pending"
+                    user_id=update.effective_user.id,
+                    city=service.location.city
                 )
-                db.add(new_order)
-                db.commit()
                 
                 await update.message.reply_text(
                     "Order placed. A WorkMan is takin' care.",
@@ -320,46 +365,124 @@ async def telegram_webhook(request: Request):
 @app.post("/services/", response_model=ServiceCreate)
 async def create_service(service: ServiceCreate):
     """Create new service"""
-    with get_db() as db:
-        try:
-            new_service = Service(
-                service_name=service.service_name,
-                description=service.description,
-                price=service.price,
-                image_path=service.image_path,
-                location=service.location
-            )
-            db.add(new_service)
-            db.commit()
-            db.refresh(new_service)
-            return new_service
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail=str(e)) from e
-        
+    try:
+        new_service = service_manager.add_service(Service(
+            provider_id=service.provider_id,
+            service_name=service.service_name,
+            description=service.description,
+            price=service.price,
+            image_path=service.image_path,
+            is_active=True,
+            location=ServiceLocation(
+                city=service.city,
+                country=service.country,
+                latitude=service.latitude,
+                longitude=service.longitude
+            ),
+            created_at=datetime.utcnow()
+        ))
+        return to_service_create(new_service)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 
 @app.get("/services/", response_model=List[ServiceCreate])
 async def get_services():
     """Get all services"""
     try:
-        return db.query(Service).all()
+        return [to_service_create(service) for service in service_manager.list_services()]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
     
+@app.get("/services/search", response_model=List[ServiceCreate])
+async def search_services(
+    city: Optional[str] = None,
+    country: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Get available services matching the filters, cheapest first"""
+    try:
+        services = await run_blocking(
+            service_manager.get_services_by_location,
+            city=city or '',
+            country=country or '',
+            min_price=min_price,
+            max_price=max_price,
+            limit=limit
+        )
+        return [to_service_create(service) for service in services]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 @app.get("/services/{service_id}", response_model=ServiceCreate)
 async def get_service(service_id: int):
     """Get a specific service by ID"""
-    if service := db.query(Service).filter(Service.service_id == service_id).first():
-        return service
+    if service := service_manager.get_service(service_id):
+        return to_service_create(service)
     else:
         raise HTTPException(status_code=404, detail="Service not found")
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
+@app.get("/stats")
+async def get_stats(
+    group_by: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[str] = None
+):
+    """Get order counts from the precomputed rollups"""
     try:
-        return await call_next(request)
-    finally:
-        db.close()
+        return await run_blocking(
+            read_order_stats, group_by=group_by, start=start, end=end, status=status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+def read_order_stats(**filters):
+    """Read order stats in a session of their own"""
+    with get_db() as db:
+        return get_order_stats(db, **filters)
+
+def run_order_rollups():
+    """Fold new order events into the rollups and trim the event log"""
+    with get_db() as db:
+        processed = roll_up_events(db)
+        deleted = compact_event_log(db)
+    if processed or deleted:
+        logger.info(f"Rolled up {processed} order events, compacted {deleted}")
+
+async def order_rollup_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, run_order_rollups)
+        except Exception as e:
+            logger.error(f"Error rolling up order events: {e}")
+        await asyncio.sleep(ROLLUP_INTERVAL_SECONDS)
+
+def resync_catalog():
+    """Reload the catalog snapshot to pick up writes from other processes"""
+    with get_db() as db:
+        build_snapshot(db, catalog)
+
+async def catalog_resync_loop():
+    while True:
+        await asyncio.sleep(CATALOG_RESYNC_SECONDS)
+        try:
+            await run_blocking(resync_catalog)
+        except Exception as e:
+            logger.error(f"Error resyncing service catalog: {e}")
+
+@app.on_event("startup")
+async def start_catalog_resync():
+    """Bound how stale the per-process catalog snapshot can get"""
+    asyncio.create_task(catalog_resync_loop())
+
+@app.on_event("startup")
+async def start_order_rollups():
+    """Run order rollups in the background, off the request path"""
+    asyncio.create_task(order_rollup_loop())
 
 @app.on_event("startup")
 async def setup_webhook():
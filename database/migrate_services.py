@@ -0,0 +1,215 @@
+# Schema upgrade of the services table and one-shot merge of legacy services.db data
+#
+# Usage: python -m database.migrate_services [path/to/services.db]
+
+from datetime import datetime
+from sqlalchemy import MetaData, create_engine, inspect, select, text
+from sqlalchemy.schema import CreateTable, DropTable
+from database.db_setup import Base, engine
+from database.models import SchemaMigration, Service
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+LEGACY_DB_PATH = "services.db"
+MIGRATION_NAME = "merge_legacy_services"
+REBUILD_TABLE = "services_rebuild"
+
+# Columns of the old sqlite3 repository and early ORM schema, by their new name
+LEGACY_COLUMN_ALIASES = {
+    "image_url": "image_path",
+    "location_city": "city",
+    "location": "city",
+    "location_country": "country",
+}
+
+
+def _is_shared_database(legacy_path: str, bind) -> bool:
+    return bind.url.get_backend_name() == "sqlite" and bool(bind.url.database) and \
+        os.path.abspath(bind.url.database) == os.path.abspath(legacy_path)
+
+
+def _begin_transaction(connection):
+    # pysqlite runs DDL outside any transaction unless one is opened explicitly
+    if connection.dialect.driver == "pysqlite":
+        connection.exec_driver_sql("BEGIN")
+
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if value:
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+
+def _convert_row(row, keep_id: bool) -> dict:
+    values = dict(row)
+    for old, new in LEGACY_COLUMN_ALIASES.items():
+        if old in values:
+            values.setdefault(new, values[old])
+
+    converted = {
+        "provider_id": values.get("provider_id"),
+        "service_name": values.get("service_name") or "",
+        "description": values.get("description") or "",
+        "price": float(values.get("price") or 0),
+        "image_path": values.get("image_path"),
+        "city": values.get("city") or "",
+        "country": values.get("country") or "",
+        "is_active": int(bool(values.get("is_active", True))),
+        "is_available_in_location": bool(values.get("is_available_in_location", True)),
+        "latitude": values.get("latitude"),
+        "longitude": values.get("longitude"),
+        "created_at": _parse_timestamp(values.get("created_at")),
+    }
+    if keep_id and values.get("service_id") is not None:
+        converted["service_id"] = values["service_id"]
+    return converted
+
+
+def _service_key(row: dict) -> tuple:
+    if row["provider_id"] is not None:
+        return ("provider", row["provider_id"], row["service_name"])
+    return ("location", row["service_name"], row["city"], row["country"])
+
+
+def _new_rows(rows, existing: set) -> list:
+    """Drop rows whose service is already in `existing` or earlier in `rows`."""
+    new_rows = []
+    for row in rows:
+        key = _service_key(row)
+        if key not in existing:
+            existing.add(key)
+            new_rows.append(row)
+    return new_rows
+
+
+def _insert_new(connection, rows) -> int:
+    """Insert rows whose service is not stored yet."""
+    existing = {
+        _service_key(dict(row))
+        for row in connection.execute(select(
+            Service.provider_id, Service.service_name, Service.city, Service.country
+        )).mappings()
+    }
+    new_rows = _new_rows(rows, existing)
+    if new_rows:
+        connection.execute(Service.__table__.insert(), new_rows)
+    return len(new_rows)
+
+
+def _missing_indexes(bind) -> list:
+    existing = {index["name"] for index in inspect(bind).get_indexes("services")}
+    return [index for index in Service.__table__.indexes if index.name not in existing]
+
+
+def _has_current_columns(bind) -> bool:
+    columns = {column["name"] for column in inspect(bind).get_columns("services")}
+    return columns == set(Service.__table__.columns.keys())
+
+
+def services_table_is_current(bind=None) -> bool:
+    """Whether the `services` table is missing or already has the model's columns and indexes."""
+    bind = bind if bind is not None else engine
+    if "services" not in inspect(bind).get_table_names():
+        return True
+    return _has_current_columns(bind) and not _missing_indexes(bind)
+
+
+def _rebuild_services_table(connection) -> int:
+    """Recreate `services` in the current schema, converting its rows.
+
+    Rows are copied into a new table before the old one is dropped, and
+    service ids are kept so existing orders still resolve.
+    """
+    rows = connection.execute(text("SELECT * FROM services")).mappings().all()
+    rebuilt = Service.__table__.to_metadata(MetaData(), name=REBUILD_TABLE)
+    connection.execute(DropTable(rebuilt, if_exists=True))
+    connection.execute(CreateTable(rebuilt))
+
+    converted = _new_rows([_convert_row(row, keep_id=True) for row in rows], set())
+    if converted:
+        connection.execute(rebuilt.insert(), converted)
+
+    connection.execute(text("DROP TABLE services"))
+    connection.execute(text(f"ALTER TABLE {REBUILD_TABLE} RENAME TO services"))
+    if connection.dialect.name == "postgresql":
+        # Ids were copied explicitly, so move the serial past them
+        connection.execute(text(
+            "SELECT setval(pg_get_serial_sequence('services', 'service_id'), "
+            "COALESCE(MAX(service_id), 0) + 1, false) FROM services"
+        ))
+    for index in Service.__table__.indexes:
+        index.create(connection)
+    return len(converted)
+
+
+def _upgrade_services_table(connection) -> int:
+    """Bring an existing `services` table onto the model's columns and indexes."""
+    if "services" not in inspect(connection).get_table_names():
+        return 0
+    if not _has_current_columns(connection):
+        return _rebuild_services_table(connection)
+    for index in _missing_indexes(connection):
+        index.create(connection)
+    return 0
+
+
+def _legacy_file_merged(connection) -> bool:
+    return connection.execute(
+        select(SchemaMigration.name).where(SchemaMigration.name == MIGRATION_NAME)
+    ).first() is not None
+
+
+def _read_legacy_rows(legacy_path: str) -> list:
+    legacy_engine = create_engine(f"sqlite:///{legacy_path}")
+    try:
+        if "services" not in inspect(legacy_engine).get_table_names():
+            return []
+        with legacy_engine.connect() as connection:
+            return connection.execute(text("SELECT * FROM services")).mappings().all()
+    finally:
+        legacy_engine.dispose()
+
+
+def migrate_legacy_services(legacy_path: str = LEGACY_DB_PATH, bind=None) -> int:
+    """Bring the shared database onto the current `services` schema and merge legacy data.
+
+    An outdated `services` table is rebuilt in place, or given its missing
+    indexes, on every run, which also covers a `DATABASE_URL` that points at
+    the legacy services.db itself. A separate legacy file is only read, and
+    its services are added unless already stored; that merge is recorded in
+    `schema_migrations` and never repeated. Everything runs in one
+    transaction. Returns the number of services written.
+    """
+    bind = bind if bind is not None else engine
+    SchemaMigration.__table__.create(bind=bind, checkfirst=True)
+
+    with bind.begin() as connection:
+        _begin_transaction(connection)
+        copied = _upgrade_services_table(connection)
+        Base.metadata.create_all(bind=connection)
+
+        if os.path.exists(legacy_path) and not _is_shared_database(legacy_path, bind):
+            if _legacy_file_merged(connection):
+                logger.info(f"Legacy services from {legacy_path} already merged")
+            else:
+                rows = _read_legacy_rows(legacy_path)
+                copied += _insert_new(connection, [_convert_row(row, keep_id=False) for row in rows])
+                connection.execute(SchemaMigration.__table__.insert().values(
+                    name=MIGRATION_NAME, applied_at=datetime.utcnow()
+                ))
+
+    logger.info(f"Migrated {copied} services")
+    return copied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate_legacy_services(sys.argv[1] if len(sys.argv) > 1 else LEGACY_DB_PATH)
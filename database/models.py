@@ -1,20 +1,47 @@
 # SQLAlchemy Models for database
 
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, Date, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import validates
+from datetime import datetime
 from database.db_setup import Base
 
+def location_key(value):
+    """Normalised city or country name, used for lookups"""
+    return (value or '').strip().lower()
+
+def _location_key_default(column):
+    # Fills the key on Core inserts (bulk loads, migrations) that bypass the ORM validators
+    return lambda context: location_key(context.get_current_parameters().get(column))
+
 class Service(Base):
     __tablename__ = 'services'
 
+    __table_args__ = (
+        UniqueConstraint('provider_id', 'service_name', name='uq_services_provider_name'),
+        Index('ix_services_location_key', 'city_key', 'country_key'),
+    )
+
     service_id = Column(Integer, primary_key=True, index=True)
-    service_name = Column(String(50), nullable=False)
+    provider_id = Column(Integer, nullable=True)
+    service_name = Column(String(50), nullable=False, index=True)
     description = Column(Text, nullable=False)
     price = Column(Float, nullable=False)
-    image_path = Column(String(100), nullable=False)
+    image_path = Column(String(100), nullable=True)
     city = Column(String(50), nullable=False)
     country = Column(String(50), nullable=False)
+    # Lower-cased, trimmed copies of city/country, so lookups can use a plain index
+    city_key = Column(String(50), nullable=False, default=_location_key_default('city'))
+    country_key = Column(String(50), nullable=False, default=_location_key_default('country'))
     is_active = Column(Integer, nullable=False)
     is_available_in_location = Column(Boolean, default=True, nullable=False)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @validates('city', 'country')
+    def _set_location_key(self, name, value):
+        setattr(self, f'{name}_key', location_key(value))
+        return value
 
 class Order(Base):
     __tablename__ = 'orders'
@@ -22,4 +49,32 @@ class Order(Base):
     service_id = Column(Integer, nullable=False)
     user_id = Column(Integer, nullable=False)
     status = Column(String, default='pending', nullable=False)
-    
\ No newline at end of file
+
+class OrderEvent(Base):
+    # Append-only log of order state changes, read only by the rollup job
+    __tablename__ = 'order_events'
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, nullable=False)
+    service_id = Column(Integer, nullable=False)
+    city = Column(String(50), nullable=False, default='')
+    status = Column(String, nullable=False)
+    previous_status = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set once the event is folded into the rollups, so late commits are not skipped
+    rolled_up = Column(Boolean, default=False, nullable=False, index=True)
+
+class OrderRollup(Base):
+    # Per day, service and city: orders created, and orders that reached `status`
+    __tablename__ = 'order_rollups'
+    day = Column(Date, primary_key=True)
+    service_id = Column(Integer, primary_key=True)
+    city = Column(String(50), primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    created = Column(Integer, default=0, nullable=False)
+
+class SchemaMigration(Base):
+    # One-shot data migrations that have already been applied
+    __tablename__ = 'schema_migrations'
+    name = Column(String(100), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,314 @@
+# Columnar in-memory snapshot of the service catalog
+
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database.models import Service, location_key
+import numpy as np
+import threading
+
+NO_CODE = -1
+EARTH_RADIUS_KM = 6371.0
+INITIAL_CAPACITY = 1024
+
+# (service_id, price, is_active, is_available, city, country, latitude, longitude)
+SnapshotRow = Tuple[int, float, bool, bool, str, str, Optional[float], Optional[float]]
+
+COLUMN_TYPES = {
+    "ids": np.int64,
+    "prices": np.float64,
+    "available": np.bool_,
+    "cities": np.int32,
+    "countries": np.int32,
+    "latitudes": np.float64,
+    "longitudes": np.float64,
+}
+
+
+def haversine_km(origin: Tuple[float, float], latitudes, longitudes):
+    """Great-circle distance in km from `origin`; works on scalars and arrays."""
+    lat0, lon0 = np.radians(origin)
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class CatalogSnapshot:
+    """NumPy-backed copy of the fields needed to filter and sort services.
+
+    Each column is a preallocated array that grows by doubling, so a service
+    costs one fixed size slot per column instead of a full ORM object. City
+    and country names are interned into integer codes. Queries build one
+    boolean mask over the columns and return service ids; callers load full
+    objects only for the rows they actually return.
+
+    A snapshot lives in one process and only sees commits made through the
+    sessions it tracks. Writes from other workers or bulk statements reach
+    it on the next `build_snapshot` resync; `materialize` re-checks the
+    filters so stale entries are never returned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._clear()
+
+    def _clear(self, capacity: int = INITIAL_CAPACITY):
+        self._columns = {name: np.zeros(capacity, dtype) for name, dtype in COLUMN_TYPES.items()}
+        self._size = 0
+        self._row_of: Dict[int, int] = {}
+        self._codes: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, service_id: int) -> bool:
+        return service_id in self._row_of
+
+    def _column(self, name: str) -> np.ndarray:
+        return self._columns[name][:self._size]
+
+    def _intern(self, value: Optional[str]) -> int:
+        key = location_key(value)
+        code = self._codes.get(key)
+        if code is None:
+            code = len(self._names)
+            self._codes[key] = code
+            self._names.append(key)
+        return code
+
+    def _lookup(self, value: str) -> int:
+        return self._codes.get(location_key(value), NO_CODE)
+
+    def _values(self, service_id, price, is_active, is_available, city, country, latitude, longitude):
+        return (
+            service_id,
+            float(price),
+            bool(is_active and is_available),
+            self._intern(city),
+            self._intern(country),
+            np.nan if latitude is None else float(latitude),
+            np.nan if longitude is None else float(longitude),
+        )
+
+    def load(self, rows: Iterable[SnapshotRow]):
+        """Replace the whole snapshot with `rows`.
+
+        The new columns are built aside and swapped in, so queries keep being
+        served from the old data while `rows` is read.
+        """
+        fresh = CatalogSnapshot()
+        values = {}
+        for row in rows:
+            values[row[0]] = fresh._values(*row)
+        capacity = max(INITIAL_CAPACITY, len(values))
+        for position, name in enumerate(COLUMN_TYPES):
+            column = np.zeros(capacity, COLUMN_TYPES[name])
+            column[:len(values)] = [value[position] for value in values.values()]
+            fresh._columns[name] = column
+        fresh._row_of = {service_id: row for row, service_id in enumerate(values)}
+        fresh._size = len(values)
+
+        with self._lock:
+            self._columns = fresh._columns
+            self._size = fresh._size
+            self._row_of = fresh._row_of
+            self._codes = fresh._codes
+            self._names = fresh._names
+
+    def upsert(self, service_id: int, price: float, is_active: bool, is_available: bool,
+               city: str, country: str, latitude: Optional[float] = None,
+               longitude: Optional[float] = None):
+        """Insert a service or overwrite its existing row."""
+        with self._lock:
+            values = self._values(service_id, price, is_active, is_available,
+                                  city, country, latitude, longitude)
+            row = self._row_of.get(service_id)
+            if row is None:
+                row = self._size
+                if row == len(self._columns["ids"]):
+                    for name, column in self._columns.items():
+                        grown = np.zeros(2 * len(column), column.dtype)
+                        grown[:row] = column
+                        self._columns[name] = grown
+                self._row_of[service_id] = row
+                self._size += 1
+            for name, value in zip(COLUMN_TYPES, values):
+                self._columns[name][row] = value
+
+    def remove(self, service_id: int):
+        """Drop a service by moving the last row into its slot."""
+        with self._lock:
+            row = self._row_of.pop(service_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                for column in self._columns.values():
+                    column[row] = column[last]
+                self._row_of[int(self._columns["ids"][row])] = row
+            self._size = last
+
+    def select(self,
+               city: Optional[str] = None,
+               country: Optional[str] = None,
+               min_price: Optional[float] = None,
+               max_price: Optional[float] = None,
+               available_only: bool = True,
+               order_by: Optional[str] = "price",
+               near: Optional[Tuple[float, float]] = None,
+               limit: Optional[int] = None) -> List[int]:
+        """Return ids of matching services, sorted by `order_by` ("price" or "distance").
+
+        Sorting by distance skips services without coordinates.
+        """
+        if order_by == "distance" and near is None:
+            raise ValueError("order_by='distance' requires a `near` coordinate")
+        if order_by not in (None, "price", "distance"):
+            raise ValueError(f"Unsupported sort key: {order_by}")
+        if limit is not None and limit <= 0:
+            return []
+
+        with self._lock:
+            prices = self._column("prices")
+            mask = self._column("available").copy() if available_only else np.ones(self._size, np.bool_)
+            if city:
+                mask &= self._column("cities") == self._lookup(city)
+            if country:
+                mask &= self._column("countries") == self._lookup(country)
+            if min_price is not None:
+                mask &= prices >= min_price
+            if max_price is not None:
+                mask &= prices <= max_price
+            rows = np.flatnonzero(mask)
+
+            if order_by == "price":
+                keys = prices[rows]
+            elif order_by == "distance":
+                keys = self._distances_from(near, rows)
+                has_coordinates = ~np.isnan(keys)
+                rows, keys = rows[has_coordinates], keys[has_coordinates]
+            else:
+                return self._column("ids")[rows[:limit]].tolist()
+
+            if limit is not None and limit < len(rows):
+                nearest = np.argpartition(keys, limit - 1)[:limit]
+                rows, keys = rows[nearest], keys[nearest]
+            return self._column("ids")[rows[np.argsort(keys, kind="stable")]].tolist()
+
+    def _distances_from(self, origin: Tuple[float, float], rows: np.ndarray) -> np.ndarray:
+        """Haversine distance in km for `rows`; NaN where coordinates are missing."""
+        return haversine_km(origin, self._column("latitudes")[rows], self._column("longitudes")[rows])
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the used part of the columns and the id index."""
+        return sum(self._column(name).nbytes for name in COLUMN_TYPES) + self._row_of.__sizeof__()
+
+
+def snapshot_row(service) -> SnapshotRow:
+    """Project a `database.models.Service` row onto the snapshot columns."""
+    return (
+        service.service_id,
+        service.price,
+        bool(service.is_active),
+        bool(service.is_available_in_location),
+        service.city,
+        service.country,
+        service.latitude,
+        service.longitude,
+    )
+
+
+def build_snapshot(db: Session, snapshot: Optional[CatalogSnapshot] = None) -> CatalogSnapshot:
+    """Fill a snapshot straight from column tuples, without building ORM objects.
+
+    Passing an existing `snapshot` resyncs it with the database.
+    """
+    snapshot = snapshot or CatalogSnapshot()
+    snapshot.load(db.query(
+        Service.service_id,
+        Service.price,
+        Service.is_active,
+        Service.is_available_in_location,
+        Service.city,
+        Service.country,
+        Service.latitude,
+        Service.longitude,
+    ).yield_per(10000))
+    return snapshot
+
+
+def track_changes(snapshot: CatalogSnapshot, session_factory):
+    """Keep `snapshot` in sync with committed `Service` writes.
+
+    Changes seen during a flush are buffered on the session and applied only
+    once the transaction commits; a rollback discards them.
+    """
+    def _pending(session) -> Dict[int, Optional[SnapshotRow]]:
+        return session.info.setdefault("catalog_changes", {})
+
+    def _changed(mapper, connection, target):
+        _pending(Session.object_session(target))[target.service_id] = snapshot_row(target)
+
+    def _deleted(mapper, connection, target):
+        _pending(Session.object_session(target))[target.service_id] = None
+
+    def _after_commit(session):
+        for service_id, row in session.info.pop("catalog_changes", {}).items():
+            if row is None:
+                snapshot.remove(service_id)
+            else:
+                snapshot.upsert(*row)
+
+    def _after_rollback(session):
+        session.info.pop("catalog_changes", None)
+
+    snapshot._listeners = [
+        (Service, "after_insert", _changed),
+        (Service, "after_update", _changed),
+        (Service, "after_delete", _deleted),
+        (session_factory, "after_commit", _after_commit),
+        (session_factory, "after_rollback", _after_rollback),
+    ]
+    for target, name, listener in snapshot._listeners:
+        event.listen(target, name, listener)
+    return snapshot
+
+
+def untrack_changes(snapshot: CatalogSnapshot):
+    """Remove the listeners installed by `track_changes`."""
+    for target, name, listener in snapshot._listeners:
+        event.remove(target, name, listener)
+    snapshot._listeners = []
+
+
+def materialize(db: Session,
+                service_ids: List[int],
+                city: Optional[str] = None,
+                country: Optional[str] = None,
+                min_price: Optional[float] = None,
+                max_price: Optional[float] = None,
+                available_only: bool = True):
+    """Load full `Service` objects for `service_ids`, keeping their order.
+
+    The snapshot's filters are applied again to the loaded rows, so services
+    changed since the snapshot last saw them are dropped rather than returned.
+    """
+    if not service_ids:
+        return []
+    query = db.query(Service).filter(Service.service_id.in_(service_ids))
+    if available_only:
+        query = query.filter(Service.is_active == 1, Service.is_available_in_location.is_(True))
+    if city:
+        query = query.filter(Service.city_key == location_key(city))
+    if country:
+        query = query.filter(Service.country_key == location_key(country))
+    if min_price is not None:
+        query = query.filter(Service.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Service.price <= max_price)
+    found = {service.service_id: service for service in query}
+    return [found[service_id] for service_id in service_ids if service_id in found]
@@ -1 +1,156 @@
 # Functions for creating, fetching and managing orders
+
+from __future__ import annotations
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database.models import Order, OrderEvent, OrderRollup, Service
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BATCH_SIZE = 5000
+EVENT_RETENTION_DAYS = 7
+
+STATS_DIMENSIONS = {
+    "day": OrderRollup.day,
+    "service": OrderRollup.service_id,
+    "city": OrderRollup.city,
+    "status": OrderRollup.status,
+}
+
+
+def record_order_event(db: Session,
+                       order: Order,
+                       city: Optional[str] = None,
+                       previous_status: Optional[str] = None):
+    """Append a state change for `order` to the event log.
+
+    Added to the caller's session so it commits atomically with the order write.
+    An event without `previous_status` marks the creation of the order.
+    """
+    db.flush()
+    db.add(OrderEvent(
+        order_id=order.order_id,
+        service_id=order.service_id,
+        city=city or '',
+        status=order.status,
+        previous_status=previous_status,
+    ))
+
+
+def create_order(db: Session,
+                 service_id: int,
+                 user_id: int,
+                 city: Optional[str] = None,
+                 status: str = "pending") -> Order:
+    """Create an order for a service and log its first event."""
+    order = Order(service_id=service_id, user_id=user_id, status=status)
+    db.add(order)
+    record_order_event(db, order, city)
+    db.commit()
+    return order
+
+
+def update_order_status(db: Session, order_id: int, status: str) -> Order:
+    """Move an order to `status` and log the change."""
+    order = db.query(Order).filter(Order.order_id == order_id).first()
+    if not order:
+        raise ValueError("Order not found")
+    if order.status != status:
+        previous_status, order.status = order.status, status
+        service = db.query(Service).filter(Service.service_id == order.service_id).first()
+        record_order_event(db, order, service.city if service else None, previous_status)
+        db.commit()
+    return order
+
+
+def roll_up_events(db: Session, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """Fold order events that are not rolled up yet into `order_rollups`.
+
+    Events are picked by their `rolled_up` flag rather than an id high-water
+    mark, so a transaction that commits after later ids were processed is
+    still counted on the next run. Each batch updates the rollups and flags
+    its events in one transaction. Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        events = db.query(OrderEvent)\
+            .filter(OrderEvent.rolled_up.is_(False))\
+            .order_by(OrderEvent.event_id)\
+            .limit(batch_size)\
+            .with_for_update(skip_locked=True)\
+            .all()
+        if not events:
+            break
+
+        counts = defaultdict(lambda: [0, 0])
+        for event in events:
+            totals = counts[(event.created_at.date(), event.service_id, event.city, event.status)]
+            totals[0] += 1
+            if event.previous_status is None:
+                totals[1] += 1
+            event.rolled_up = True
+
+        for key, (count, created) in counts.items():
+            rollup = db.get(OrderRollup, key)
+            if rollup is None:
+                day, service_id, city, status = key
+                db.add(OrderRollup(
+                    day=day, service_id=service_id, city=city, status=status,
+                    count=count, created=created
+                ))
+            else:
+                rollup.count += count
+                rollup.created += created
+
+        db.commit()
+        processed += len(events)
+
+    return processed
+
+
+def compact_event_log(db: Session, retention_days: int = EVENT_RETENTION_DAYS) -> int:
+    """Delete rolled-up events older than `retention_days`.
+
+    Only events already folded into the rollups are removed, so no change is
+    lost. Returns the number of deleted events.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = db.query(OrderEvent)\
+        .filter(OrderEvent.rolled_up.is_(True), OrderEvent.created_at < cutoff)\
+        .delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def get_order_stats(db: Session,
+                    group_by: str = "day",
+                    start: Optional[date] = None,
+                    end: Optional[date] = None,
+                    status: Optional[str] = None) -> List[Dict]:
+    """Order counts grouped by one dimension, read from the rollups only.
+
+    Grouped or filtered by status, `orders` is the number of orders that
+    moved into that status. Otherwise it is the number of orders created, so
+    an order counts once however many times its status changes.
+    """
+    if group_by not in STATS_DIMENSIONS:
+        raise ValueError(f"Cannot group by '{group_by}'")
+    dimension = STATS_DIMENSIONS[group_by]
+    measure = OrderRollup.count if group_by == "status" or status is not None else OrderRollup.created
+
+    query = db.query(dimension, func.sum(measure))
+    if start is not None:
+        query = query.filter(OrderRollup.day >= start)
+    if end is not None:
+        query = query.filter(OrderRollup.day <= end)
+    if status is not None:
+        query = query.filter(OrderRollup.status == status)
+
+    return [
+        {group_by: value, "orders": int(total)}
+        for value, total in query.group_by(dimension).having(func.sum(measure) > 0).order_by(dimension)
+    ]
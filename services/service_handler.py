@@ -1,13 +1,13 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from PIL import Image, ImageDraw, ImageFont
-from typing import List, Optional, Protocol
-# from database.models import Service
-# from database.db_setup import get_db
+from typing import List, Optional, Protocol, Tuple
+from database.models import Service as ServiceRecord, location_key
+from database.db_setup import SessionLocal
+from services.catalog_snapshot import CatalogSnapshot, haversine_km, materialize
 from pathlib import Path
 from pydantic import BaseModel
 from datetime import datetime
-import sqlite3
 from dataclasses import dataclass
 import os
 import sys
@@ -34,9 +34,12 @@ class ServiceLocation:
     city: str
     country: str
     is_available: bool = True
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class Service(BaseModel):
-    provider_id: int
+    service_id: Optional[int] = None
+    provider_id: Optional[int] = None
     service_name: str
     description: str
     price: float
@@ -52,8 +55,23 @@ class Service(BaseModel):
 class ServiceRepository(Protocol):
     def add(self, service: Service) -> Service:
         pass
+
+    def get(self, service_id: int) -> Optional[Service]:
+        pass
+
+    def get_by_name(self, service_name: str) -> Optional[Service]:
+        pass
+
+    def list_all(self) -> List[Service]:
+        pass
     
-    def get_by_location(self, city: str, country: str) -> List[Service]:
+    def get_by_location(self,
+                        city: str,
+                        country: str,
+                        min_price: Optional[float] = None,
+                        max_price: Optional[float] = None,
+                        near: Optional[Tuple[float, float]] = None,
+                        limit: Optional[int] = None) -> List[Service]:
         pass
     
     def update_availability(self, service_id: int, location: ServiceLocation) -> Service:
@@ -62,41 +80,150 @@ class ServiceRepository(Protocol):
     def check_availability(self, service_id: int, city: str, country: str) -> bool:
         pass
   
-class SQLiteServiceRepository(ServiceRepository):
-    def __init__(self, db_name: str = "services.db"):
-        self.db_name = db_name
-        self.init_database()
-
-    def init_database(self):
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-               CREATE TABLE IF NOT EXISTS services (
-                    provider_id INTEGER,
-                    service_name TEXT,
-                    description TEXT,
-                    price REAL,
-                    image_url TEXT,
-                    is_active BOOLEAN,
-                    location_city TEXT,
-                    location_country TEXT,
-                    created_at TIMESTAMP,
-                    PRIMARY KEY (provider_id, service_name)
-                )
-            """)
-            conn.commit()
+class SQLAlchemyServiceRepository(ServiceRepository):
+    """Service storage on the shared, pooled engine from `database.db_setup`.
+
+    Location lookups go through the catalog snapshot when one is given, so
+    only the matching rows are loaded from the database. Both lookup paths
+    match city and country case-insensitively and return available services,
+    cheapest first or nearest to `near` (skipping services without coordinates).
+    """
+
+    def __init__(self, session_factory=SessionLocal, catalog: Optional[CatalogSnapshot] = None):
+        self.session_factory = session_factory
+        self.catalog = catalog
+
+    @staticmethod
+    def to_service(record: ServiceRecord) -> Service:
+        return Service(
+            service_id=record.service_id,
+            provider_id=record.provider_id,
+            service_name=record.service_name,
+            description=record.description,
+            price=record.price,
+            image_path=record.image_path,
+            is_active=bool(record.is_active),
+            location=ServiceLocation(
+                city=record.city,
+                country=record.country,
+                is_available=record.is_available_in_location,
+                latitude=record.latitude,
+                longitude=record.longitude
+            ),
+            created_at=record.created_at
+        )
 
     def add(self, service: Service) -> Service:
         """Add a new service to the database."""
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO services (provider_id, service_name, description, price, image_url, is_active, location_city, location_country)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (service.provider_id, service.service_name, service.description, service.price,
-                  service.image_path, service.is_active, service.location.city, service.location.country))
-            conn.commit()
-            return service  # Return the added service
+        with self.session_factory() as db:
+            record = ServiceRecord(
+                provider_id=service.provider_id,
+                service_name=service.service_name,
+                description=service.description,
+                price=service.price,
+                image_path=service.image_path,
+                city=service.location.city,
+                country=service.location.country,
+                is_active=int(service.is_active),
+                is_available_in_location=service.location.is_available,
+                latitude=service.location.latitude,
+                longitude=service.location.longitude,
+                created_at=service.created_at
+            )
+            db.add(record)
+            db.commit()
+            db.refresh(record)
+            return self.to_service(record)
+
+    def get(self, service_id: int) -> Optional[Service]:
+        with self.session_factory() as db:
+            record = db.get(ServiceRecord, service_id)
+            return self.to_service(record) if record else None
+
+    def get_by_name(self, service_name: str) -> Optional[Service]:
+        with self.session_factory() as db:
+            record = db.query(ServiceRecord).filter(ServiceRecord.service_name == service_name).first()
+            return self.to_service(record) if record else None
+
+    def list_all(self) -> List[Service]:
+        with self.session_factory() as db:
+            return [self.to_service(record) for record in db.query(ServiceRecord).all()]
+
+    def get_by_location(self,
+                        city: str,
+                        country: str,
+                        min_price: Optional[float] = None,
+                        max_price: Optional[float] = None,
+                        near: Optional[Tuple[float, float]] = None,
+                        limit: Optional[int] = None) -> List[Service]:
+        with self.session_factory() as db:
+            if self.catalog is not None:
+                service_ids = self.catalog.select(
+                    city=city,
+                    country=country,
+                    min_price=min_price,
+                    max_price=max_price,
+                    order_by="distance" if near else "price",
+                    near=near,
+                    limit=limit
+                )
+                records = materialize(
+                    db, service_ids, city=city, country=country,
+                    min_price=min_price, max_price=max_price
+                )
+            else:
+                records = self._query_by_location(db, city, country, min_price, max_price, near, limit)
+            return [self.to_service(record) for record in records]
+
+    @staticmethod
+    def _query_by_location(db, city, country, min_price, max_price, near, limit) -> List[ServiceRecord]:
+        query = db.query(ServiceRecord).filter(
+            ServiceRecord.is_active == 1,
+            ServiceRecord.is_available_in_location.is_(True)
+        )
+        if city:
+            query = query.filter(ServiceRecord.city_key == location_key(city))
+        if country:
+            query = query.filter(ServiceRecord.country_key == location_key(country))
+        if min_price is not None:
+            query = query.filter(ServiceRecord.price >= min_price)
+        if max_price is not None:
+            query = query.filter(ServiceRecord.price <= max_price)
+        if not near:
+            return query.order_by(ServiceRecord.price).limit(limit).all()
+
+        records = query.filter(
+            ServiceRecord.latitude.isnot(None),
+            ServiceRecord.longitude.isnot(None)
+        ).all()
+        records.sort(key=lambda record: haversine_km(near, record.latitude, record.longitude))
+        return records[:limit]
+
+    def update_availability(self, service_id: int, location: ServiceLocation) -> Service:
+        with self.session_factory() as db:
+            record = db.get(ServiceRecord, service_id)
+            if not record:
+                raise ValueError("Service not found")
+            record.city = location.city
+            record.country = location.country
+            record.is_available_in_location = location.is_available
+            if location.latitude is not None and location.longitude is not None:
+                record.latitude = location.latitude
+                record.longitude = location.longitude
+            db.commit()
+            db.refresh(record)
+            return self.to_service(record)
+
+    def check_availability(self, service_id: int, city: str, country: str) -> bool:
+        with self.session_factory() as db:
+            record = db.get(ServiceRecord, service_id)
+            return bool(
+                record
+                and record.is_active
+                and record.is_available_in_location
+                and record.city_key == location_key(city)
+                and record.country_key == location_key(country)
+            )
 
 # Custom Exceptions
 class ServiceOperationError(Exception):
@@ -173,14 +300,41 @@ class ServiceManager:
 
     def add_service(self, service: Service) -> Service:
         try:
-            service.image_path = self.image_generator.generate(service)
+            if not service.image_path:
+                service.image_path = self.image_generator.generate(service)
             return self.repository.add(service)
         except Exception as e:
             raise ServiceOperationError("Failed to add service", e) from e
 
-    def get_services_by_location(self, city: str, country: str) -> List[Service]:
+    def get_service(self, service_id: int) -> Optional[Service]:
+        try:
+            return self.repository.get(service_id)
+        except Exception as e:
+            raise ServiceOperationError("Failed to fetch service", e) from e
+
+    def get_service_by_name(self, service_name: str) -> Optional[Service]:
+        try:
+            return self.repository.get_by_name(service_name)
+        except Exception as e:
+            raise ServiceOperationError("Failed to fetch service", e) from e
+
+    def list_services(self) -> List[Service]:
+        try:
+            return self.repository.list_all()
+        except Exception as e:
+            raise ServiceOperationError("Failed to fetch services", e) from e
+
+    def get_services_by_location(self,
+                                 city: str,
+                                 country: str,
+                                 min_price: Optional[float] = None,
+                                 max_price: Optional[float] = None,
+                                 near: Optional[Tuple[float, float]] = None,
+                                 limit: Optional[int] = None) -> List[Service]:
         try:
-            return self.repository.get_by_location(city, country)
+            return self.repository.get_by_location(
+                city, country, min_price=min_price, max_price=max_price, near=near, limit=limit
+            )
         except Exception as e:
             raise ServiceOperationError("Failed to fetch services", e) from e
 
@@ -0,0 +1,8 @@
+# Shared pytest setup
+
+import os
+import sys
+
+# database.db_setup needs a URL at import time; tests use their own engines
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
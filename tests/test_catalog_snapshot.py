@@ -0,0 +1,47 @@
+from services.catalog_snapshot import CatalogSnapshot
+import pytest
+
+
+@pytest.fixture
+def snapshot():
+    snapshot = CatalogSnapshot()
+    snapshot.load([
+        (1, 30000, True, True, "Kampala", "Uganda", 0.31, 32.58),
+        (2, 60000, True, True, "kampala ", "Uganda", None, None),
+        (3, 10000, True, False, "Kampala", "Uganda", 0.32, 32.59),
+        (4, 20000, True, True, "Kampala", "Uganda", 0.50, 32.60),
+        (5, 5000, True, True, "Gulu", "Uganda", 2.77, 32.30),
+    ])
+    return snapshot
+
+
+def test_filters_by_city_and_price_cheapest_first(snapshot):
+    assert snapshot.select(city="KAMPALA", max_price=50000) == [4, 1]
+    assert snapshot.select(country="uganda", min_price=20000) == [4, 1, 2]
+    assert snapshot.select(city="Jinja") == []
+
+
+def test_top_k_and_unavailable_rows(snapshot):
+    assert snapshot.select(limit=2) == [5, 4]
+    assert snapshot.select(available_only=False, limit=3) == [5, 3, 4]
+    assert snapshot.select(limit=0) == []
+
+
+def test_distance_skips_services_without_coordinates(snapshot):
+    assert snapshot.select(order_by="distance", near=(0.30, 32.58)) == [1, 4, 5]
+    assert snapshot.select(order_by="distance", near=(2.7, 32.3), limit=1) == [5]
+    with pytest.raises(ValueError):
+        snapshot.select(order_by="distance")
+
+
+def test_upsert_and_remove_keep_rows_consistent(snapshot):
+    snapshot.upsert(4, 1, True, True, "Kampala", "Uganda")
+    snapshot.remove(1)
+    snapshot.remove(99)
+    assert 1 not in snapshot and len(snapshot) == 4
+    assert snapshot.select(city="kampala") == [4, 2]
+
+    for service_id in range(10, 3000):
+        snapshot.upsert(service_id, service_id, True, True, "Jinja", "Uganda")
+    assert len(snapshot) == 2994
+    assert snapshot.select(city="jinja", limit=3) == [10, 11, 12]
@@ -0,0 +1,125 @@
+from sqlalchemy import Index, create_engine, inspect, text
+from database import migrate_services
+from database.migrate_services import migrate_legacy_services, services_table_is_current
+import pytest
+import sqlite3
+
+BASELINE_SCHEMA = """
+    CREATE TABLE services (
+        service_id INTEGER NOT NULL PRIMARY KEY,
+        service_name VARCHAR(50) NOT NULL,
+        description TEXT NOT NULL,
+        price FLOAT NOT NULL,
+        image_path VARCHAR(100) NOT NULL,
+        location VARCHAR(50) NOT NULL,
+        is_active INTEGER NOT NULL
+    )
+"""
+
+LEGACY_SCHEMA = """
+    CREATE TABLE services (
+        provider_id INTEGER,
+        service_name TEXT,
+        description TEXT,
+        price REAL,
+        image_url TEXT,
+        is_active BOOLEAN,
+        location_city TEXT,
+        location_country TEXT,
+        created_at TIMESTAMP,
+        PRIMARY KEY (provider_id, service_name)
+    )
+"""
+
+
+def make_db(path, schema, rows=()):
+    with sqlite3.connect(path) as conn:
+        conn.execute(schema)
+        for row in rows:
+            conn.execute(f"INSERT INTO services VALUES ({', '.join('?' * len(row))})", row)
+    return str(path)
+
+
+@pytest.fixture
+def legacy_file(tmp_path):
+    return make_db(tmp_path / "services.db", LEGACY_SCHEMA, [
+        (1, "Electrician", "wiring", 45000, None, 1, "Kampala", "Uganda", "2024-11-02 10:00:00"),
+        (2, "Plumber", "taps", 30000, "tap.png", 1, "Gulu", "Uganda", None),
+    ])
+
+
+def services(bind):
+    with bind.connect() as connection:
+        return connection.execute(text(
+            "SELECT service_id, provider_id, service_name, image_path, city, city_key FROM services "
+            "ORDER BY service_name"
+        )).all()
+
+
+def test_rebuilds_shared_legacy_database_in_place(legacy_file):
+    bind = create_engine(f"sqlite:///{legacy_file}")
+    assert migrate_legacy_services(legacy_file, bind=bind) == 2
+    assert services_table_is_current(bind)
+    assert services(bind) == [
+        (1, 1, "Electrician", None, "Kampala", "kampala"),
+        (2, 2, "Plumber", "tap.png", "Gulu", "gulu"),
+    ]
+    assert "ix_services_location_key" in {index["name"] for index in inspect(bind).get_indexes("services")}
+
+
+def test_upgrades_outdated_shared_database_and_merges_legacy_file(tmp_path, legacy_file):
+    shared = make_db(tmp_path / "shared.db", BASELINE_SCHEMA, [
+        (7, "Carpenter", "doors", 20000, "door.png", "Jinja", 1),
+    ])
+    bind = create_engine(f"sqlite:///{shared}")
+    assert migrate_legacy_services(legacy_file, bind=bind) == 3
+    assert services(bind) == [
+        (7, None, "Carpenter", "door.png", "Jinja", "jinja"),
+        (8, 1, "Electrician", None, "Kampala", "kampala"),
+        (9, 2, "Plumber", "tap.png", "Gulu", "gulu"),
+    ]
+
+
+def test_runs_only_once(tmp_path, legacy_file):
+    bind = create_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+    assert migrate_legacy_services(legacy_file, bind=bind) == 2
+    with bind.begin() as connection:
+        connection.execute(text("DELETE FROM services"))
+    assert migrate_legacy_services(legacy_file, bind=bind) == 0
+    assert services(bind) == []
+
+
+def test_upgrades_outdated_table_after_the_merge(tmp_path, legacy_file):
+    bind = create_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+    assert migrate_legacy_services(legacy_file, bind=bind) == 2
+    with bind.begin() as connection:
+        connection.execute(text("DROP INDEX ix_services_location_key"))
+    assert not services_table_is_current(bind)
+
+    assert migrate_legacy_services(legacy_file, bind=bind) == 0
+    assert services_table_is_current(bind)
+    assert len(services(bind)) == 2
+
+
+@pytest.mark.parametrize("target, name", [
+    (migrate_services, "_new_rows"),     # before the old table is dropped
+    (Index, "create"),                   # after the drop and rename
+])
+def test_failed_rebuild_keeps_the_original_table(monkeypatch, legacy_file, target, name):
+    def fail(*args, **kwargs):
+        raise RuntimeError("migration step failed")
+
+    monkeypatch.setattr(target, name, fail)
+    bind = create_engine(f"sqlite:///{legacy_file}")
+    with pytest.raises(RuntimeError):
+        migrate_legacy_services(legacy_file, bind=bind)
+
+    tables = set(inspect(bind).get_table_names())
+    assert "services_rebuild" not in tables
+    assert not services_table_is_current(bind)
+    with bind.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM services")).scalar() == 2
+        assert connection.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar() == 0
+
+    monkeypatch.undo()
+    assert migrate_legacy_services(legacy_file, bind=bind) == 2
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db_setup import Base
+from database.models import OrderEvent, OrderRollup
+from services.order_handler import (
+    create_order, update_order_status, roll_up_events, compact_event_log, get_order_stats
+)
+import pytest
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def place_orders(db):
+    first = create_order(db, service_id=1, user_id=10, city="Kampala")
+    create_order(db, service_id=2, user_id=11, city="Gulu")
+    update_order_status(db, first.order_id, "confirmed")
+
+
+def test_stats_count_orders_not_status_changes(db):
+    place_orders(db)
+    assert roll_up_events(db) == 3
+    assert roll_up_events(db) == 0
+
+    today = datetime.utcnow().date()
+    assert get_order_stats(db, group_by="day") == [{"day": today, "orders": 2}]
+    assert get_order_stats(db, group_by="city") == [
+        {"city": "Gulu", "orders": 1}, {"city": "Kampala", "orders": 1}
+    ]
+    assert get_order_stats(db, group_by="service") == [
+        {"service": 1, "orders": 1}, {"service": 2, "orders": 1}
+    ]
+    assert get_order_stats(db, group_by="status") == [
+        {"status": "confirmed", "orders": 1}, {"status": "pending", "orders": 2}
+    ]
+    assert get_order_stats(db, group_by="day", status="confirmed") == [{"day": today, "orders": 1}]
+    with pytest.raises(ValueError):
+        get_order_stats(db, group_by="user")
+
+
+def test_late_committed_events_are_still_rolled_up(db):
+    now = datetime.utcnow()
+    db.add(OrderEvent(event_id=5, order_id=1, service_id=1, city="Kampala", status="pending", created_at=now))
+    db.commit()
+    assert roll_up_events(db) == 1
+
+    # A transaction that got a lower id commits after the rollup ran
+    db.add(OrderEvent(event_id=3, order_id=2, service_id=1, city="Kampala", status="pending", created_at=now))
+    db.commit()
+    assert roll_up_events(db) == 1
+
+    rollup = db.query(OrderRollup).one()
+    assert (rollup.count, rollup.created) == (2, 2)
+
+
+def test_compaction_only_drops_old_rolled_up_events(db):
+    place_orders(db)
+    roll_up_events(db)
+    create_order(db, service_id=1, user_id=12, city="Kampala")
+
+    old = datetime.utcnow() - timedelta(days=30)
+    db.query(OrderEvent).update({OrderEvent.created_at: old})
+    db.commit()
+
+    assert compact_event_log(db, retention_days=7) == 3
+    remaining = db.query(OrderEvent).all()
+    assert len(remaining) == 1 and not remaining[0].rolled_up
+
+    assert compact_event_log(db, retention_days=7) == 0
+    assert roll_up_events(db) == 1
+    assert compact_event_log(db, retention_days=7) == 1
+    assert db.query(OrderEvent).count() == 0
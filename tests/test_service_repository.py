@@ -0,0 +1,116 @@
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database.db_setup import Base
+from services.catalog_snapshot import CatalogSnapshot, build_snapshot, track_changes, untrack_changes
+from database.models import Service as ServiceRecord
+from services.service_handler import SQLAlchemyServiceRepository, Service, ServiceLocation
+import pytest
+
+SERVICES = [
+    ("Electrician", 45000, "Kampala", "Uganda", 0.31, 32.58, True),
+    ("Plumber", 30000, "kampala", "UGANDA", None, None, True),
+    ("Carpenter", 20000, "Kampala", "Uganda", 0.50, 32.60, False),
+    ("Mechanic", 15000, "Gulu", "Uganda", 2.77, 32.30, True),
+]
+
+
+@pytest.fixture(params=["sql", "catalog"])
+def repository(request):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    catalog = None
+    if request.param == "catalog":
+        with session_factory() as db:
+            catalog = track_changes(build_snapshot(db, CatalogSnapshot()), session_factory)
+
+    repository = SQLAlchemyServiceRepository(session_factory=session_factory, catalog=catalog)
+    for name, price, city, country, latitude, longitude, available in SERVICES:
+        repository.add(Service(
+            provider_id=1,
+            service_name=name,
+            description=name.lower(),
+            price=price,
+            image_path=None,
+            is_active=True,
+            location=ServiceLocation(city, country, available, latitude, longitude),
+            created_at=datetime.utcnow()
+        ))
+    yield repository
+    if catalog is not None:
+        untrack_changes(catalog)
+    engine.dispose()
+
+
+def names(services):
+    return [service.service_name for service in services]
+
+
+def test_lookup_paths_agree(repository):
+    assert names(repository.get_by_location("KAMPALA ", "")) == ["Plumber", "Electrician"]
+    assert names(repository.get_by_location("", "uganda", max_price=40000)) == ["Mechanic", "Plumber"]
+    assert names(repository.get_by_location("", "", limit=1)) == ["Mechanic"]
+    assert names(repository.get_by_location("", "", near=(0.3, 32.5))) == ["Electrician", "Mechanic"]
+    assert repository.get_by_location("Jinja", "") == []
+
+
+def test_round_trips_coordinates(repository):
+    service = repository.get_by_name("Electrician")
+    assert (service.location.latitude, service.location.longitude) == (0.31, 32.58)
+    assert repository.check_availability(service.service_id, "kampala", "UGANDA")
+
+
+def test_rolled_back_writes_do_not_reach_the_snapshot(repository):
+    if repository.catalog is None:
+        pytest.skip("SQL path has no snapshot")
+    with repository.session_factory() as db:
+        record = db.query(ServiceRecord).filter(ServiceRecord.service_name == "Mechanic").one()
+        record.price = 1
+        db.flush()
+        db.add(ServiceRecord(service_name="Welder", description="d", price=2, city="Gulu",
+                             country="Uganda", is_active=1))
+        db.flush()
+        db.rollback()
+    assert len(repository.catalog) == len(SERVICES)
+    assert names(repository.get_by_location("", "", max_price=100)) == []
+
+
+def test_writes_the_snapshot_missed_are_filtered_on_load(repository):
+    # Bulk updates bypass the ORM events, leaving the snapshot stale
+    with repository.session_factory() as db:
+        db.query(ServiceRecord).filter(ServiceRecord.service_name == "Plumber")\
+            .update({ServiceRecord.is_active: 0})
+        db.query(ServiceRecord).filter(ServiceRecord.service_name == "Mechanic")\
+            .update({ServiceRecord.price: 90000})
+        db.commit()
+    assert names(repository.get_by_location("", "", max_price=50000)) == ["Electrician"]
+
+    if repository.catalog is not None:
+        with repository.session_factory() as db:
+            build_snapshot(db, repository.catalog)
+        electrician = repository.get_by_name("Electrician")
+        assert repository.catalog.select(max_price=50000) == [electrician.service_id]
+
+
+def test_location_lookups_use_the_index(repository):
+    if repository.catalog is not None:
+        pytest.skip("snapshot path loads rows by primary key")
+    engine = repository.session_factory.kw["bind"]
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and "city_key" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        repository.get_by_location("Kampala", "Uganda")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert statements
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            assert any("ix_services_location_key" in row[-1] for row in plan)